@@ -15,100 +15,127 @@ What it does:
 """
 
 import os
-import json
+import csv
 import math
 import statistics
 import base64
-from datetime import datetime
+import functools
+import mmap
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-try:
-    import pandas as pd
-except Exception:
-    pd = None
-
-# Optional OpenAI usage (only if available and configured)
-try:
-    import openai
-except Exception:
-    openai = None
+from io_utils import jdumps, load_json, dump_json, load_visual_diff, strip_external_scripts
 
-# Optional PDF regeneration (WeasyPrint)
 try:
-    from weasyprint import HTML
+    import numpy as np
 except Exception:
-    HTML = None
+    np = None
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 RESULTS_DIR = os.path.join(ROOT, "results")
 VISUAL_DIFFS_DIR = os.path.join(RESULTS_DIR, "visual_diffs")
+VISUAL_DIFF_SUMMARY = os.path.join(VISUAL_DIFFS_DIR, "visual_diff_summary.json")
+REPORT_HTML = os.path.join(RESULTS_DIR, "research_report.html")
+REPORT_PDF = os.path.join(RESULTS_DIR, "research_report.pdf")
 
 INSIGHT_OUTPUT = os.path.join(RESULTS_DIR, "ai_insights.json")
 INSIGHT_HTML_SNIPPET = os.path.join(RESULTS_DIR, "ai_insights_snippet.html")
 
+# Marker emitted by generate_report.py just before </body>; snippets are inserted ahead of it
+AI_INSIGHTS_SLOT = b"<!-- AI_INSIGHTS_SLOT -->"
+
+# How many previous run folders to load concurrently when looking for a baseline
+PREV_SCAN_WORKERS = 4
+
 
 # -------------------------
 # Helper utilities
 # -------------------------
 def latest_results_folder():
-    folders = [
-        f for f in os.listdir(RESULTS_DIR)
-        if os.path.isdir(os.path.join(RESULTS_DIR, f))
-        and f not in ("visual_diffs", "charts")
-    ]
-    if not folders:
+    # single scandir pass: DirEntry caches is_dir()/stat() from the directory read
+    with os.scandir(RESULTS_DIR) as it:
+        entries = [
+            (e.name, e.stat().st_mtime) for e in it
+            if e.is_dir() and e.name not in ("visual_diffs", "charts")
+        ]
+    if not entries:
         raise FileNotFoundError("No result folders found in results/")
-    folders_sorted = sorted(
-        folders,
-        key=lambda f: os.path.getmtime(os.path.join(RESULTS_DIR, f))
-    )
+    entries.sort(key=lambda e: e[1])
+    folders_sorted = [name for name, _ in entries]
     return folders_sorted[-1], folders_sorted
 
 
+@functools.lru_cache(maxsize=None)
 def load_crawl_metrics(folder):
-    """Return list of [url, timeTaken] and dict mapping url->time"""
-    metrics_path = os.path.join(RESULTS_DIR, folder, "crawl_metrics.csv")
-    summary_path = os.path.join(RESULTS_DIR, folder, "summary.json")
+    """Return tuple of (url, timeTaken) pairs; cached per folder for the process"""
+    folder_path = os.path.join(RESULTS_DIR, folder)
     metrics = []
-    if pd is not None and os.path.exists(metrics_path):
-        try:
-            df = pd.read_csv(metrics_path)
-            if "url" in df.columns and "timeTaken" in df.columns:
-                for _, r in df[["url", "timeTaken"]].iterrows():
-                    metrics.append([str(r["url"]), float(r["timeTaken"])])
-                return metrics
-        except Exception:
-            pass
+    # EAFP: open directly instead of exists() + open(), a missing CSV just falls through
+    try:
+        with open(os.path.join(folder_path, "crawl_metrics.csv"), "r", newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fields = reader.fieldnames or []
+            if "url" in fields and "timeTaken" in fields:
+                for r in reader:
+                    t = r.get("timeTaken")
+                    if t:
+                        metrics.append((str(r["url"]), float(t)))
+                return tuple(metrics)
+    except Exception:
+        metrics = []
 
     # fallback to summary.json
-    if os.path.exists(summary_path):
-        with open(summary_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            for p in data:
-                url = p.get("url")
-                t = p.get("timeTaken")
-                if url is not None and t is not None:
-                    try:
-                        metrics.append([str(url), float(t)])
-                    except:
-                        pass
-    return metrics
+    try:
+        data = load_json(os.path.join(folder_path, "summary.json"))
+    except FileNotFoundError:
+        data = []
+    for p in data:
+        url = p.get("url")
+        t = p.get("timeTaken")
+        if url is not None and t is not None:
+            try:
+                metrics.append((str(url), float(t)))
+            except:
+                pass
+    return tuple(metrics)
 
 
 def load_visual_diffs():
-    path = os.path.join(VISUAL_DIFFS_DIR, "visual_diff_summary.json")
-    if not os.path.exists(path):
-        return []
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_visual_diff(VISUAL_DIFF_SUMMARY)
     except Exception:
-        return []
+        return ()
+
+
+def find_previous_metrics(folders):
+    """
+    Return (folder, metrics) for the newest folder in `folders` (oldest first)
+    that has metrics, or (None, ()) if none do. Folders are loaded in batches
+    of PREV_SCAN_WORKERS threads so empty runs don't serialize CSV reads.
+    """
+    candidates = list(reversed(folders))
+    with ThreadPoolExecutor(max_workers=PREV_SCAN_WORKERS) as ex:
+        for start in range(0, len(candidates), PREV_SCAN_WORKERS):
+            batch = candidates[start:start + PREV_SCAN_WORKERS]
+            for f, metrics in zip(batch, ex.map(load_crawl_metrics, batch)):
+                if metrics:
+                    return f, metrics
+    return None, ()
 
 
 def iqr_outliers(values):
     """Return indices of IQR outliers (upper outliers)"""
-    if not values:
+    if len(values) == 0:
         return []
+    if np is not None:
+        arr = np.asarray(values, dtype=np.float64)
+        # same order statistics as the fallback (no interpolation), via O(n) selection
+        i1, i3 = int(len(arr) * 0.25), int(len(arr) * 0.75)
+        q1, q3 = np.partition(arr, [i1, i3])[[i1, i3]]
+        iqr = q3 - q1
+        if iqr == 0:
+            return []
+        return np.flatnonzero(arr > q3 + 1.5 * iqr).tolist()
     vals = sorted(values)
     q1_idx = int(len(vals) * 0.25)
     q3_idx = int(len(vals) * 0.75)
@@ -123,11 +150,17 @@ def iqr_outliers(values):
 
 
 def zscore_outliers(values, threshold=2.5):
-    import statistics as stats
     if len(values) < 2:
         return []
-    mean = stats.mean(values)
-    stdev = stats.pstdev(values) if stats.pstdev(values) != 0 else None
+    if np is not None:
+        arr = np.asarray(values, dtype=np.float64)
+        mean = arr.mean()
+        stdev = arr.std()
+        if stdev == 0:
+            return []
+        return np.flatnonzero(np.abs((arr - mean) / stdev) >= threshold).tolist()
+    mean = statistics.mean(values)
+    stdev = statistics.pstdev(values)
     if not stdev:
         return []
     out = []
@@ -138,10 +171,57 @@ def zscore_outliers(values, threshold=2.5):
     return out
 
 
+def analyze_times(times, threshold=2.5):
+    """
+    IQR + z-score outliers and the mean of one run's load times.
+    Returns (iqr_idx, z_idx, mean); mean is None for empty input.
+    """
+    if not times:
+        return [], [], None
+    if np is not None:
+        # convert once; np.asarray in the helpers is then a no-op
+        arr = np.asarray(times, dtype=np.float64)
+        return iqr_outliers(arr), zscore_outliers(arr, threshold), float(arr.mean())
+    return iqr_outliers(times), zscore_outliers(times, threshold), statistics.mean(times)
+
+
+def percent_increases(urls, times, prev_map, threshold=30):
+    """
+    Join latest (urls, times) against prev_map (url -> previous time) and
+    return pages whose load time changed by at least `threshold` percent.
+    """
+    out = []
+    if not urls or not prev_map:
+        return out
+    if np is not None:
+        # sorted-key join: searchsorted locates every latest URL among the previous ones
+        prev_urls = np.array(list(prev_map), dtype=str)
+        prev_vals = np.fromiter(prev_map.values(), dtype=np.float64, count=len(prev_map))
+        order = np.argsort(prev_urls)
+        prev_urls, prev_vals = prev_urls[order], prev_vals[order]
+        latest_urls = np.array(urls, dtype=str)
+        pos = np.minimum(np.searchsorted(prev_urls, latest_urls), len(prev_urls) - 1)
+        prev_t = np.where(prev_urls[pos] == latest_urls, prev_vals[pos], np.nan)
+        latest_t = np.asarray(times, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = ((latest_t - prev_t) / prev_t) * 100.0
+        hits = np.flatnonzero((prev_t != 0) & (np.abs(pct) >= threshold))
+        for i in hits.tolist():
+            out.append({"url": urls[i], "previous": float(prev_t[i]), "latest": float(latest_t[i]), "pct_change": float(pct[i])})
+        return out
+    for u, t in zip(urls, times):
+        prev_t = prev_map.get(u)
+        if prev_t:
+            pct = ((t - prev_t) / prev_t) * 100.0
+            if abs(pct) >= threshold:
+                out.append({"url": u, "previous": float(prev_t), "latest": float(t), "pct_change": float(pct)})
+    return out
+
+
 # -------------------------
 # Anomaly detection
 # -------------------------
-def detect_performance_anomalies(latest_folder, folders_sorted):
+def detect_performance_anomalies(latest_folder, folders_sorted, latest_metrics=None):
     """
     Detect:
     - unusually slow pages within latest run (IQR or z-score)
@@ -150,7 +230,8 @@ def detect_performance_anomalies(latest_folder, folders_sorted):
     """
     result = {"per_page": [], "run_level": []}
 
-    latest_metrics = load_crawl_metrics(latest_folder)
+    if latest_metrics is None:
+        latest_metrics = load_crawl_metrics(latest_folder)
     if not latest_metrics:
         return result
 
@@ -158,33 +239,34 @@ def detect_performance_anomalies(latest_folder, folders_sorted):
     urls = [u for u, t in latest_metrics]
     times = [float(t) for _, t in latest_metrics]
     # per-page: internal outliers
-    iqr_idx = iqr_outliers(times)
-    z_idx = zscore_outliers(times, threshold=2.5)
-    outlier_indices = sorted(set(iqr_idx + z_idx))
+    iqr_idx, z_idx, latest_avg = analyze_times(times, threshold=2.5)
+    iqr_set, z_set = set(iqr_idx), set(z_idx)
+    outlier_indices = sorted(iqr_set | z_set)
 
     for i in outlier_indices:
         result["per_page"].append({
             "url": urls[i],
             "time": times[i],
             "reason": "internal_outlier",
-            "iqr": (i in iqr_idx),
-            "zscore": (i in z_idx)
+            "iqr": (i in iqr_set),
+            "zscore": (i in z_set)
         })
 
     # compare with previous run (if exists)
     prev_avg = None
     prev_folder = None
     # find previous folder that has metrics
-    for f in reversed(folders_sorted[:-1]):
-        candidate = load_crawl_metrics(f)
-        if candidate:
-            prev_folder = f
-            prev_times = [float(t) for _, t in candidate]
-            prev_avg = statistics.mean(prev_times) if prev_times else None
-            prev_map = {u: float(t) for u, t in candidate}
-            break
-
-    latest_avg = statistics.mean(times) if times else None
+    f, candidate = find_previous_metrics(folders_sorted[:-1])
+    if candidate:
+        prev_folder = f
+        prev_times = []
+        prev_map = {}
+        for u, t in candidate:
+            tf = float(t)
+            prev_times.append(tf)
+            prev_map[u] = tf
+        prev_avg = sum(prev_times) / len(prev_times) if prev_times else None
+
     if prev_avg is not None and latest_avg is not None:
         percent_change = ((latest_avg - prev_avg) / prev_avg) * 100.0 if prev_avg != 0 else None
         result["run_level"].append({
@@ -196,68 +278,64 @@ def detect_performance_anomalies(latest_folder, folders_sorted):
         })
 
         # per-url percent increase vs previous value for that url
-        per_url_increases = []
-        for u, t in latest_metrics:
-            prev_t = prev_map.get(u)
-            if prev_t is not None:
-                try:
-                    pct = ((float(t) - float(prev_t)) / float(prev_t)) * 100.0 if float(prev_t) != 0 else None
-                    if pct is not None and abs(pct) >= 30:  # per-page threshold 30%
-                        per_url_increases.append({"url": u, "previous": prev_t, "latest": t, "pct_change": pct})
-                except:
-                    pass
+        per_url_increases = percent_increases(urls, times, prev_map, threshold=30)  # per-page threshold 30%
         result["per_page"].extend([{"url": p["url"], "time": p["latest"], "reason": "percent_increase", "pct": p["pct_change"]} for p in per_url_increases])
 
     return result
 
 
-def detect_visual_anomalies():
+def detect_visual_anomalies(visual=None):
     """
     From visual_diff_summary.json detect pages with high diffPercent
     Use IQR or threshold (e.g., > 1% or mean+2*std)
     """
-    visual = load_visual_diffs()
+    if visual is None:
+        visual = load_visual_diffs()
     result = []
     if not visual:
         return result
-    diffs = []
+    # single pass: parse each diffPercent once, running mean/M2 (Welford)
+    entries = []
+    n = 0
+    mean = 0.0
+    m2 = 0.0
     for v in visual:
         try:
-            diffs.append(float(v.get("diffPercent", 0)))
+            dp = float(v.get("diffPercent", 0))
         except:
-            diffs.append(0.0)
-    mean = statistics.mean(diffs) if diffs else 0
-    stdev = statistics.pstdev(diffs) if len(diffs) > 1 else 0
+            dp = 0.0
+        n += 1
+        delta = dp - mean
+        mean += delta / n
+        m2 += delta * (dp - mean)
+        entries.append((v.get("url"), dp))
+    stdev = math.sqrt(m2 / n) if n > 1 else 0
     thr = max(1.0, mean + 2 * stdev)  # at least 1% diff as minimum concern
-    for v in visual:
-        dp = float(v.get("diffPercent", 0))
+    for url, dp in entries:
         if dp >= thr:
-            result.append({"url": v.get("url"), "diffPercent": dp, "reason": "high_diff"})
+            result.append({"url": url, "diffPercent": dp, "reason": "high_diff"})
     return result
 
 
 # -------------------------
 # Natural language summary (optional OpenAI)
 # -------------------------
+PROMPT_HEADER = (
+    "You are an assistant that summarizes QA crawl results and highlights anomalies.\n"
+    "Provide short bullet points: key findings, likely causes, and prioritized recommendations.\n"
+)
+PROMPT_FOOTER = "Now generate a concise summary (3-6 bullets) and 2 prioritized remediation suggestions."
+
+
 def make_prompt(perf_anoms, visual_anoms, run_info):
-    lines = []
-    lines.append("You are an assistant that summarizes QA crawl results and highlights anomalies.")
-    lines.append("Provide short bullet points: key findings, likely causes, and prioritized recommendations.")
-    lines.append("")
-    lines.append("Run info:")
-    lines.append(json.dumps(run_info, indent=2))
-    lines.append("")
-    lines.append("Performance anomalies (per_page):")
-    lines.append(json.dumps(perf_anoms.get("per_page", []), indent=2))
-    lines.append("")
-    lines.append("Run-level performance (run_level):")
-    lines.append(json.dumps(perf_anoms.get("run_level", []), indent=2))
-    lines.append("")
-    lines.append("Visual anomalies:")
-    lines.append(json.dumps(visual_anoms, indent=2))
-    lines.append("")
-    lines.append("Now generate a concise summary (3-6 bullets) and 2 prioritized remediation suggestions.")
-    return "\n".join(lines)
+    return (
+        f"{PROMPT_HEADER}\n"
+        f"Run info:\n{jdumps(run_info, indent=True)}\n\n"
+        f"Performance anomalies (per_page):\n{jdumps(perf_anoms.get('per_page', []), indent=True)}\n\n"
+        f"Run-level performance (run_level):\n{jdumps(perf_anoms.get('run_level', []), indent=True)}\n\n"
+        f"Visual anomalies:\n{jdumps(visual_anoms, indent=True)}\n\n"
+        f"{PROMPT_FOOTER}"
+    )
 
 
 def generate_text_summary(perf_anoms, visual_anoms, run_info):
@@ -265,9 +343,10 @@ def generate_text_summary(perf_anoms, visual_anoms, run_info):
     If openai is configured and OPENAI_API_KEY present, call the API.
     Otherwise, produce a local rule-based summary.
     """
-    # If OpenAI available and key present, call it
-    if openai is not None and os.environ.get("OPENAI_API_KEY"):
+    # If OpenAI available and key present, call it (imported lazily: costly on cold start)
+    if os.environ.get("OPENAI_API_KEY"):
         try:
+            import openai
             prompt = make_prompt(perf_anoms, visual_anoms, run_info)
             # Use ChatCompletion if available; adapt to user's environment
             # We'll use `gpt-4o-mini` or fallback to `gpt-4o` depending on availability
@@ -333,7 +412,7 @@ def generate_text_summary(perf_anoms, visual_anoms, run_info):
 # -------------------------
 def build_insight_payload(perf_anoms, visual_anoms, summary_text, latest_folder):
     payload = {
-        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
         "run_folder": latest_folder,
         "performance_anomalies": perf_anoms,
         "visual_anomalies": visual_anoms,
@@ -344,24 +423,35 @@ def build_insight_payload(perf_anoms, visual_anoms, summary_text, latest_folder)
 
 def write_insights_json(payload):
     try:
-        with open(INSIGHT_OUTPUT, "w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2)
+        dump_json(payload, INSIGHT_OUTPUT)
         print(f"AI insights saved → {INSIGHT_OUTPUT}")
     except Exception as e:
         print("Failed to save insights JSON:", e)
 
 
+def write_html_snippet(snippet):
+    try:
+        with open(INSIGHT_HTML_SNIPPET, "w", encoding="utf-8") as f:
+            f.write(snippet)
+        print("AI insights snippet saved →", INSIGHT_HTML_SNIPPET)
+    except Exception as e:
+        print("Failed to save html snippet:", e)
+
+
 def html_snippet_from_summary(payload):
     ts = payload.get("timestamp")
-    summary = payload.get("summary", {}).get("text", "")
-    source = payload.get("summary", {}).get("source", "local")
-    perf_count = len(payload.get("performance_anomalies", {}).get("per_page", [])) + len(payload.get("performance_anomalies", {}).get("run_level", []))
+    summary_info = payload.get("summary", {})
+    source = summary_info.get("source", "local")
+    # one linear pass over the text; newlines become <br/> for the HTML block
+    summary_html = summary_info.get("text", "").replace("\n", "<br/>")
+    perf = payload.get("performance_anomalies", {})
+    perf_count = len(perf.get("per_page", [])) + len(perf.get("run_level", []))
     vis_count = len(payload.get("visual_anomalies", []))
     html = f"""
 <div style="background:#fff8e1;border-left:6px solid #ffb300;padding:15px;border-radius:8px;margin:20px 0;">
   <h3 style="color:#ff9800;margin:0 0 8px 0;">🤖 AI Insights (automated) — source: {source}</h3>
   <p style="margin:0 0 8px 0;color:#444;font-size:0.95em;"><b>Generated:</b> {ts}</p>
-  <div style="font-size:0.95em;color:#222;">{summary.replace(chr(10), '<br/>')}</div>
+  <div style="font-size:0.95em;color:#222;">{summary_html}</div>
   <hr/>
   <p style="margin:8px 0 0 0;color:#666;font-size:0.85em;">Detected performance anomalies: <b>{perf_count}</b> — visual anomalies: <b>{vis_count}</b></p>
 </div>
@@ -370,41 +460,62 @@ def html_snippet_from_summary(payload):
 
 
 def inject_into_report(html_snippet):
-    report_path = os.path.join(RESULTS_DIR, "research_report.html")
-    if not os.path.exists(report_path):
+    try:
+        with open(REPORT_HTML, "r+b") as f:
+            # locate the slot (or </body> for older reports) and rewrite only the tail
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                idx = mm.find(AI_INSIGHTS_SLOT)
+                if idx == -1:
+                    idx = mm.rfind(b"</body>")
+                if idx == -1:
+                    print("Could not find </body> in research_report.html — skipping injection.")
+                    return False
+                tail = mm[idx:]
+            f.seek(idx)
+            f.write(html_snippet.encode("utf-8") + b"\n" + tail)
+        print(f"Injected AI insights into {REPORT_HTML}")
+        return True
+    except FileNotFoundError:
         print("Cannot inject: research_report.html not found.")
         return False
-    try:
-        with open(report_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        # naive injection: before closing body
-        if "</body>" in content:
-            new_content = content.replace("</body>", f"{html_snippet}\n</body>")
-            with open(report_path, "w", encoding="utf-8") as f:
-                f.write(new_content)
-            print(f"Injected AI insights into {report_path}")
-            return True
-        else:
-            print("Could not find </body> in research_report.html — skipping injection.")
-            return False
     except Exception as e:
         print("Failed to inject snippet:", e)
         return False
 
 
-def regenerate_pdf():
-    report_path = os.path.join(RESULTS_DIR, "research_report.html")
-    out_pdf = os.path.join(RESULTS_DIR, "research_report.pdf")
-    if HTML is None:
-        print("WeasyPrint not available; skipping PDF regeneration.")
-        return False
+def render_pdf():
+    """Re-render REPORT_PDF from REPORT_HTML; returns (ok, message) and prints nothing."""
+    # Optional PDF regeneration (WeasyPrint) — imported only when actually needed
     try:
-        HTML(report_path).write_pdf(out_pdf)
-        print(f"Regenerated PDF → {out_pdf}")
-        return True
+        from weasyprint import HTML
+    except Exception:
+        return False, "WeasyPrint not available; skipping PDF regeneration."
+    try:
+        with open(REPORT_HTML, "r", encoding="utf-8") as f:
+            html = strip_external_scripts(f.read())
+        HTML(string=html, base_url=RESULTS_DIR).write_pdf(REPORT_PDF, optimize_images=True)
+        return True, f"Regenerated PDF → {REPORT_PDF}"
+    except FileNotFoundError:
+        return False, "Cannot regenerate PDF: research_report.html not found."
     except Exception as e:
-        print("PDF regeneration failed:", e)
-        return False
+        return False, f"PDF regeneration failed: {e}"
+
+
+def regenerate_pdf():
+    ok, message = render_pdf()
+    print(message)
+    return ok
+
+
+def write_outputs(payload, snippet, regen_pdf=False):
+    """Write insights JSON and HTML snippet here while the PDF renders on a worker thread."""
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        # the worker only renders; all console output stays on this thread
+        pdf_job = ex.submit(render_pdf) if regen_pdf else None
+        write_insights_json(payload)
+        write_html_snippet(snippet)
+        if pdf_job is not None:
+            print(pdf_job.result()[1])
 
 
 # -------------------------
@@ -414,36 +525,30 @@ def main(auto_inject=True, auto_regen_pdf=True):
     latest, folders_sorted = latest_results_folder()
     print("Latest run:", latest)
 
-    perf_anoms = detect_performance_anomalies(latest, folders_sorted)
-    visual_anoms = detect_visual_anomalies()
+    metrics = load_crawl_metrics(latest)
+    visual = load_visual_diffs()
+
+    perf_anoms = detect_performance_anomalies(latest, folders_sorted, metrics)
+    visual_anoms = detect_visual_anomalies(visual)
 
     # Basic run info
     run_info = {
         "latest_run": latest,
-        "num_pages": len(load_crawl_metrics(latest)),
-        "visual_diffs_count": len(load_visual_diffs()),
+        "num_pages": len(metrics),
+        "visual_diffs_count": len(visual),
     }
 
     summary = generate_text_summary(perf_anoms, visual_anoms, run_info)
     payload = build_insight_payload(perf_anoms, visual_anoms, summary, latest)
 
-    # Save JSON
-    write_insights_json(payload)
-
-    # Create HTML snippet and save
+    # Create HTML snippet and inject into report
     snippet = html_snippet_from_summary(payload)
-    try:
-        with open(INSIGHT_HTML_SNIPPET, "w", encoding="utf-8") as f:
-            f.write(snippet)
-        print("AI insights snippet saved →", INSIGHT_HTML_SNIPPET)
-    except Exception as e:
-        print("Failed to save html snippet:", e)
+    injected = inject_into_report(snippet) if auto_inject else False
 
-    # Inject into report
-    if auto_inject:
-        injected = inject_into_report(snippet)
-        if injected and auto_regen_pdf:
-            regenerate_pdf()
+    # Save JSON + snippet while the PDF renders
+    write_outputs(payload, snippet, regen_pdf=injected and auto_regen_pdf)
+    # for callers (ai_monitor) deciding whether the report changed; not written to ai_insights.json
+    payload["report_injected"] = injected
 
     # Print short console summary
     print("----- AI Insight Summary -----")
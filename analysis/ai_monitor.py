@@ -6,10 +6,12 @@ Loads config.json, runs Phase 4 (ai_insight_engine) with thresholds,
 and sends Slack / Email notifications automatically.
 """
 
-import os, json, smtplib, ssl, requests
+import os, smtplib, ssl, asyncio, requests
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from ai_insight_engine import main as run_insight_engine
+from concurrent.futures import ProcessPoolExecutor
+from ai_insight_engine import main as run_insight_engine, regenerate_pdf
+from io_utils import load_json
 
 CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.json"))
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
@@ -18,8 +20,7 @@ RESULTS = os.path.join(ROOT, "results")
 def load_config():
     if not os.path.exists(CONFIG_PATH):
         raise FileNotFoundError("config.json missing — create one in project root")
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(CONFIG_PATH)
 
 def send_slack_message(webhook_url, text):
     try:
@@ -52,18 +53,33 @@ def summarize_payload(payload):
     txt += payload["summary"]["text"][:900] + "..."
     return txt
 
+async def send_notifications(cfg, payload, msg_text):
+    # Slack POST and SMTP send are independent blocking calls; run them side by side
+    tasks = []
+    if cfg["notifications"]["enable_slack"]:
+        tasks.append(asyncio.to_thread(send_slack_message, cfg["notifications"]["slack_webhook_url"], msg_text))
+
+    if cfg["notifications"]["enable_email"]:
+        email_cfg = cfg["notifications"]["email"]
+        tasks.append(asyncio.to_thread(send_email, email_cfg, f"AI QA Report — {payload['run_folder']}", msg_text))
+
+    await asyncio.gather(*tasks)
+
 def main():
     cfg = load_config()
     payload = run_insight_engine(auto_inject=cfg["report"]["inject_into_html"],
-                                 auto_regen_pdf=cfg["report"]["regenerate_pdf"])
+                                 auto_regen_pdf=False)
+    # only re-render when the insights actually made it into the report
+    regen_pdf = payload.get("report_injected") and cfg["report"]["regenerate_pdf"]
     msg_text = summarize_payload(payload)
 
-    if cfg["notifications"]["enable_slack"]:
-        send_slack_message(cfg["notifications"]["slack_webhook_url"], msg_text)
-
-    if cfg["notifications"]["enable_email"]:
-        email_cfg = cfg["notifications"]["email"]
-        send_email(email_cfg, f"AI QA Report — {payload['run_folder']}", msg_text)
+    # WeasyPrint rendering is CPU-bound and holds the GIL; notifications don't need
+    # the PDF, so render it in a worker process while they are sent
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        pdf_job = pool.submit(regenerate_pdf) if regen_pdf else None
+        asyncio.run(send_notifications(cfg, payload, msg_text))
+        if pdf_job is not None:
+            pdf_job.result()
 
     print("\n✅ Please check your inbox.")
 
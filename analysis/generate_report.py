@@ -8,14 +8,19 @@
 """
 
 import os
-import json
-import statistics
+from pathlib import Path
 import base64
+import mmap
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime
-from weasyprint import HTML
-import plotly.graph_objects as go
+from io_utils import load_json, dump_json, load_visual_diff, strip_external_scripts, CHART_DPI, SAVEFIG_OPTS
+
+try:
+    import pybase64
+except Exception:
+    pybase64 = None
 
 # === Setup ===
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
@@ -24,24 +29,55 @@ VISUAL_DIFFS = os.path.join(RESULTS, "visual_diffs")
 CHARTS = os.path.join(RESULTS, "charts")
 os.makedirs(CHARTS, exist_ok=True)
 
+# Set EXPORT_PDF=0 for HTML-only runs: skips the static trend PNG and the WeasyPrint pass
+EXPORT_PDF = os.environ.get("EXPORT_PDF", "1").strip().lower() not in {"0", "false", "no"}
+
+# Only url/timeTaken are used; declaring them skips dtype inference on every column
+METRICS_CSV_OPTS = dict(usecols=["url", "timeTaken"], dtype={"url": "string", "timeTaken": "float64"}, engine="c")
+
+# Report stylesheet (plain string, interpolated once into the report template)
+REPORT_CSS = """\
+body { font-family: 'Segoe UI', Arial, sans-serif; margin: 40px; background: #ffffff; color: #333; }
+h1, h2 { color: #1a73e8; text-align: center; }
+.card { background: #fafafa; padding: 20px; border-radius: 10px; box-shadow: 0 3px 10px rgba(0,0,0,0.08); margin-bottom: 30px; }
+.chart-container { display:flex; justify-content:center; align-items:center; margin:30px auto; width:100%; max-width:900px; padding:15px; background:#f9f9f9; border-radius:12px; }
+img.chart { max-width:100%; height:auto; border-radius:10px; display:block; }
+footer { text-align:center; margin-top:40px; font-size:0.9em; color:#666; }
+table { width:100%; border-collapse:collapse; margin-top:10px; }
+th, td { border:1px solid #ddd; padding:8px; text-align:center; }
+th { background:#1a73e8; color:white; }
+"""
+
+
+def encode_base64(path):
+    """Base64-encode a file straight from an mmap (no read() copy of the raw bytes)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if pybase64 is not None:
+                # SIMD encoder, returns str directly
+                return pybase64.b64encode_as_string(mm)
+            return base64.b64encode(memoryview(mm)).decode("ascii")
+
 # === Detect All Crawl Folders ===
-folders = [
-    f for f in os.listdir(RESULTS)
-    if os.path.isdir(os.path.join(RESULTS, f))
-    and f not in ["visual_diffs", "charts"]
-]
-if not folders:
+# single scandir pass: DirEntry caches is_dir()/stat() from the directory read
+with os.scandir(RESULTS) as it:
+    entries = [
+        e for e in it
+        if e.is_dir() and e.name not in {"visual_diffs", "charts"}
+    ]
+if not entries:
     raise FileNotFoundError("❌ No crawl results found in /results/")
 
-folders_sorted = sorted(
-    folders,
-    key=lambda f: os.path.getmtime(os.path.join(RESULTS, f))
-)
+entries.sort(key=lambda e: e.stat().st_mtime)
+folders_sorted = [e.name for e in entries]
 latest_folder = folders_sorted[-1]
 
 # === File Paths ===
 crawl_summary_path = os.path.join(RESULTS, latest_folder, "summary.json")
 crawl_metrics_path = os.path.join(RESULTS, latest_folder, "crawl_metrics.csv")
+crawl_parquet_path = os.path.join(RESULTS, latest_folder, "crawl_metrics.parquet")
 visual_diff_path = os.path.join(VISUAL_DIFFS, "visual_diff_summary.json")
 
 visual_chart_path = os.path.join(CHARTS, "visual_diff_chart.png")
@@ -50,44 +86,68 @@ trend_chart_path = os.path.join(CHARTS, "performance_trend_chart.png")
 
 report_html = os.path.join(RESULTS, "research_report.html")
 report_pdf = os.path.join(RESULTS, "research_report.pdf")
+trend_cache_path = os.path.join(RESULTS, "trend_cache.json")
 
 # === Load Latest Crawl Summary ===
-with open(crawl_summary_path, "r", encoding="utf-8") as f:
-    crawl_data = json.load(f)
+crawl_data = load_json(crawl_summary_path)
+
+# single pass: page/error counts plus the (url, float time) rows used when no CSV/Parquet exists
+total_pages = errors = 0
+summary_metrics = []
+summary_append = summary_metrics.append  # local bind, skips the attribute lookup per page
+for page in crawl_data:
+    if "error" in page:
+        errors += 1
+    else:
+        total_pages += 1
+    t = page.get("timeTaken")
+    if t is not None and "url" in page:
+        try:
+            summary_append((page["url"], float(t)))
+        except (TypeError, ValueError):
+            pass
 
 # === Load Performance Data ===
-metrics_data = []
-if os.path.exists(crawl_metrics_path):
+# Prefer the columnar sidecar written by web_recorder.py; fall back to CSV, then JSON
+with os.scandir(os.path.join(RESULTS, latest_folder)) as it:
+    latest_files = {e.name for e in it}
+
+df_metrics = None
+if "crawl_metrics.parquet" in latest_files:
     try:
-        df_metrics = pd.read_csv(crawl_metrics_path)
-        if "url" in df_metrics.columns and "timeTaken" in df_metrics.columns:
-            metrics_data = df_metrics[["url", "timeTaken"]].values.tolist()
+        df_metrics = pd.read_parquet(crawl_parquet_path, columns=["url", "timeTaken"])
     except:
-        metrics_data = []
-else:
-    for page in crawl_data:
-        if "url" in page and "timeTaken" in page:
-            metrics_data.append([page["url"], page["timeTaken"]])
-
-# === Compute Key Stats ===
-times = []
-for _, t in metrics_data:
+        df_metrics = None
+if df_metrics is None and "crawl_metrics.csv" in latest_files:
     try:
-        times.append(float(t))
+        df_metrics = pd.read_csv(crawl_metrics_path, **METRICS_CSV_OPTS)
     except:
-        pass
+        df_metrics = None
+
+if df_metrics is not None and not {"url", "timeTaken"} <= set(df_metrics.columns):
+    df_metrics = None
+
+# One typed frame feeds the stats, the chart and the latest trend point
+if df_metrics is None:
+    df_metrics = pd.DataFrame(summary_metrics, columns=["url", "timeTaken"])
+df_metrics = df_metrics[["url", "timeTaken"]]
+if df_metrics["timeTaken"].dtype != np.float64:
+    df_metrics = df_metrics.assign(timeTaken=pd.to_numeric(df_metrics["timeTaken"], errors="coerce"))
+df_metrics = df_metrics.dropna(subset=["timeTaken"])
 
-avg_time = round(statistics.mean(times), 2) if times else 0
-median_time = round(statistics.median(times), 2) if times else 0
-max_time = round(max(times), 2) if times else 0
-total_pages = len([p for p in crawl_data if "error" not in p])
-errors = len([p for p in crawl_data if "error" in p])
+# === Compute Key Stats ===
+if not df_metrics.empty:
+    stats = df_metrics["timeTaken"].agg(["mean", "median", "max"])
+    avg_time = round(float(stats["mean"]), 2)
+    median_time = round(float(stats["median"]), 2)
+    max_time = round(float(stats["max"]), 2)
+else:
+    avg_time = median_time = max_time = 0
 
 # === Load Visual Diff Summary ===
 visual_diff_data = []
 if os.path.exists(visual_diff_path):
-    with open(visual_diff_path, "r", encoding="utf-8") as f:
-        visual_diff_data = json.load(f)
+    visual_diff_data = load_visual_diff(visual_diff_path)
 
 ui_stability = 100
 if visual_diff_data:
@@ -97,68 +157,124 @@ if visual_diff_data:
 else:
     avg_change = 0.0
 
+# === Chart rendering ===
+# Each chart gets its own OO Figure + Agg canvas (no pyplot global state), so the
+# PNGs can be rendered on worker threads while the main thread loads trend data.
+def new_chart(figsize):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize, dpi=CHART_DPI)
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+def save_performance_chart(df_chart, path):
+    fig, ax = new_chart((10, 6))
+    ax.barh(df_chart["url"], df_chart["timeTaken"], color="#1a73e8")
+    ax.set_xlabel("Load Time (seconds)")
+    ax.set_ylabel("Page URL")
+    ax.set_title("Average Page Load Time (Top 10 URLs)")
+    fig.tight_layout()
+    fig.savefig(path, **SAVEFIG_OPTS)
+
+
+def save_trend_chart(trend_data, path):
+    labels_static, averages_static = zip(*trend_data)
+    fig, ax = new_chart((10, 5))
+    ax.plot(labels_static, averages_static, marker="o", color="#00796B", linewidth=2)
+    ax.set_title("Average Load Time Trend Across Crawls")
+    ax.set_xlabel("Crawl Run (Date & Time)")
+    ax.set_ylabel("Average Load Time (s)")
+    ax.grid(True, linestyle="--", alpha=0.6)
+    fig.tight_layout()
+    fig.savefig(path, **SAVEFIG_OPTS)
+
+
+chart_pool = ThreadPoolExecutor(max_workers=2)
+chart_jobs = []
+
 # === Generate Performance Chart ===
-if metrics_data:
-    df_chart = pd.DataFrame(metrics_data, columns=["url", "timeTaken"])
-    df_chart["timeTaken"] = pd.to_numeric(df_chart["timeTaken"], errors="coerce")
-    df_chart = df_chart.dropna(subset=["timeTaken"]).sort_values("timeTaken", ascending=False).head(10)
-    plt.figure(figsize=(10, 6))
-    plt.barh(df_chart["url"], df_chart["timeTaken"], color="#1a73e8")
-    plt.xlabel("Load Time (seconds)")
-    plt.ylabel("Page URL")
-    plt.title("Average Page Load Time (Top 10 URLs)")
-    plt.tight_layout()
-    plt.savefig(performance_chart_path)
-    plt.close()
+if not df_metrics.empty:
+    # partial selection of the 10 slowest, no full sort needed
+    chart_jobs.append(chart_pool.submit(save_performance_chart, df_metrics.nlargest(10, "timeTaken"), performance_chart_path))
 
 # === Generate Trend Data (for interactive + static fallback) ===
+# Past runs don't change, so per-run means are cached in trend_cache.json keyed by
+# folder and only recomputed when the source file's mtime moves. The cache lives
+# in results/ rather than inside each run folder so it never bumps a run's mtime.
+try:
+    trend_cache = load_json(trend_cache_path)
+except Exception:
+    trend_cache = {}
+trend_cache_dirty = False
+
 trend_data = []
 for f in folders_sorted:
-    folder_path = os.path.join(RESULTS, f)
-    csv_path = os.path.join(folder_path, "crawl_metrics.csv")
-    summary_path = os.path.join(folder_path, "summary.json")
-    run_times = []
+    if f == latest_folder:
+        # already loaded above; its mean is avg_time
+        if not df_metrics.empty:
+            trend_data.append((f, avg_time))
+        continue
+    # one directory read per run instead of an exists() probe per candidate file
+    try:
+        with os.scandir(os.path.join(RESULTS, f)) as it:
+            files = {e.name: e for e in it}
+    except OSError:
+        continue
+    source = files.get("crawl_metrics.csv") or files.get("summary.json")
+    if source is None:
+        continue
+    source_name = source.name
+    source_path = source.path
+    source_mtime = source.stat().st_mtime
+
+    cached = trend_cache.get(f)
+    if cached and cached.get("source") == source_name and cached.get("mtime") == source_mtime:
+        if cached.get("mean") is not None:
+            trend_data.append((f, cached["mean"]))
+        continue
 
-    if os.path.exists(csv_path):
+    run_times = []
+    if source_name == "crawl_metrics.csv":
         try:
-            df = pd.read_csv(csv_path)
-            if "timeTaken" in df.columns:
-                run_times = pd.to_numeric(df["timeTaken"], errors="coerce").dropna().tolist()
+            df = pd.read_csv(source_path, usecols=["timeTaken"], dtype={"timeTaken": "float64"}, engine="c")
+            run_times = df["timeTaken"].dropna().to_numpy()
         except:
             pass
-    elif os.path.exists(summary_path):
+    else:
         try:
-            with open(summary_path, "r", encoding="utf-8") as j:
-                js = json.load(j)
-                for page in js:
-                    if "timeTaken" in page:
-                        try:
-                            run_times.append(float(page["timeTaken"]))
-                        except:
-                            pass
+            js = load_json(source_path)
+            for page in js:
+                if "timeTaken" in page:
+                    try:
+                        run_times.append(float(page["timeTaken"]))
+                    except:
+                        pass
         except:
             pass
 
-    if run_times:
-        trend_data.append((f, round(statistics.mean(run_times), 2)))
+    run_mean = round(float(np.mean(run_times)), 2) if len(run_times) else None
+    trend_cache[f] = {"source": source_name, "mtime": source_mtime, "mean": run_mean}
+    trend_cache_dirty = True
+    if run_mean is not None:
+        trend_data.append((f, run_mean))
+
+if trend_cache_dirty:
+    try:
+        dump_json(trend_cache, trend_cache_path)
+    except Exception as e:
+        print(f"⚠️ Could not update trend cache: {e}")
 
 # === Create static PNG for PDF fallback ===
-if len(trend_data) >= 1:
-    labels_static, averages_static = zip(*trend_data)
-    plt.figure(figsize=(10, 5))
-    plt.plot(labels_static, averages_static, marker="o", color="#00796B", linewidth=2)
-    plt.title("Average Load Time Trend Across Crawls")
-    plt.xlabel("Crawl Run (Date & Time)")
-    plt.ylabel("Average Load Time (s)")
-    plt.grid(True, linestyle="--", alpha=0.6)
-    plt.tight_layout()
-    plt.savefig(trend_chart_path)
-    plt.close()
+# WeasyPrint can't run the Plotly JS, so only the PDF needs this image
+if EXPORT_PDF and len(trend_data) >= 1:
+    chart_jobs.append(chart_pool.submit(save_trend_chart, trend_data, trend_chart_path))
 
 # === Interactive Plotly chart + always-on PNG fallback ===
 interactive_trend_html_fragment = "<p>⚠️ Not enough crawl data for trendline.</p>"
-trend_png_html = ""
 if len(trend_data) >= 2:
+    # plotly pulls in a large package tree; only import it when there is a trend to draw
+    import plotly.graph_objects as go
     labels, averages = zip(*trend_data)
     fig = go.Figure()
     fig.add_trace(go.Scatter(
@@ -177,41 +293,51 @@ if len(trend_data) >= 2:
     )
     interactive_trend_html_fragment = fig.to_html(full_html=False, include_plotlyjs="cdn")
 
-# embed static PNG directly (always visible in PDF)
-if os.path.exists(trend_chart_path):
-    with open(trend_chart_path, "rb") as imgf:
-        encoded_trend = base64.b64encode(imgf.read()).decode("utf-8")
-        trend_png_html = f"<div><img src='data:image/png;base64,{encoded_trend}' style='max-width:100%;height:auto;border-radius:6px;'/></div>"
+# charts must be on disk before they're embedded; result() re-raises any render error
+for job in chart_jobs:
+    job.result()
+chart_pool.shutdown()
+
+# === Helpers to embed static charts ===
+# The HTML report inlines PNGs as base64 so it stays self-contained; the PDF
+# variant links them as file:// URLs, which WeasyPrint loads directly instead
+# of decoding a data URI embedded in a 4/3x larger HTML string.
+def chart_src(path, inline=True):
+    if inline:
+        return f"data:image/png;base64,{encode_base64(path)}"
+    return Path(path).as_uri()
 
-# === Helper to embed static charts ===
-def embed_chart(path):
+
+def embed_chart(path, inline=True):
     if os.path.exists(path):
-        with open(path, "rb") as img_file:
-            encoded = base64.b64encode(img_file.read()).decode("utf-8")
-            return f"<img src='data:image/png;base64,{encoded}' class='chart' style='max-width:100%;height:auto;border-radius:10px;display:block;margin:auto;'/>"
+        return f"<img src='{chart_src(path, inline)}' class='chart' style='max-width:100%;height:auto;border-radius:10px;display:block;margin:auto;'/>"
     return "<p>⚠️ Chart not available.</p>"
 
-visual_chart_html = embed_chart(visual_chart_path)
-performance_chart_html = embed_chart(performance_chart_path)
+
+def embed_trend_png(inline=True):
+    # static PNG (always visible in PDF); not rendered on HTML-only runs
+    if EXPORT_PDF and os.path.exists(trend_chart_path):
+        return f"<div><img src='{chart_src(trend_chart_path, inline)}' style='max-width:100%;height:auto;border-radius:6px;'/></div>"
+    return ""
 
 # === Top 5 Slowest Pages ===
 slowest_html = "<p>⚠️ No performance data available.</p>"
-if metrics_data:
-    top5 = sorted(metrics_data, key=lambda x: float(x[1]) if str(x[1]).replace('.', '', 1).lstrip('-').isdigit() else 0, reverse=True)[:5]
-    slowest_html = "<table style='width:100%;border-collapse:collapse;'><tr><th>Rank</th><th>Page URL</th><th>Load Time (s)</th></tr>"
-    for i, (url, t) in enumerate(top5, 1):
-        try:
-            t_val = float(t)
-            color = "#f44336" if i == 1 else "#4CAF50" if t_val < avg_time else "#ff9800"
-            slowest_html += f"<tr style='color:{color}'><td>{i}</td><td>{url}</td><td>{round(t_val,2)}</td></tr>"
-        except:
-            slowest_html += f"<tr><td>{i}</td><td>{url}</td><td>{t}</td></tr>"
-    slowest_html += "</table>"
+if not df_metrics.empty:
+    top5 = df_metrics.nlargest(5, "timeTaken").itertuples(index=False, name=None)
+    parts = ["<table style='width:100%;border-collapse:collapse;'><tr><th>Rank</th><th>Page URL</th><th>Load Time (s)</th></tr>"]
+    append = parts.append
+    for i, (url, t_val) in enumerate(top5, 1):
+        color = "#f44336" if i == 1 else "#4CAF50" if t_val < avg_time else "#ff9800"
+        append(f"<tr style='color:{color}'><td>{i}</td><td>{url}</td><td>{round(t_val,2)}</td></tr>")
+    append("</table>")
+    slowest_html = "".join(parts)
 
 # === Build HTML ===
-timestamp = datetime.now().strftime("%d %B %Y, %I:%M %p")
+timestamp = time.strftime("%d %B %Y, %I:%M %p")
+
 
-html = f"""
+def build_html(visual_chart_html, performance_chart_html, trend_png_html):
+    return f"""
 <!doctype html>
 <html>
 <head>
@@ -219,16 +345,7 @@ html = f"""
 <title>QA Research Report — {latest_folder}</title>
 <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
 <style>
-body {{ font-family: 'Segoe UI', Arial, sans-serif; margin: 40px; background: #ffffff; color: #333; }}
-h1, h2 {{ color: #1a73e8; text-align: center; }}
-.card {{ background: #fafafa; padding: 20px; border-radius: 10px; box-shadow: 0 3px 10px rgba(0,0,0,0.08); margin-bottom: 30px; }}
-.chart-container {{ display:flex; justify-content:center; align-items:center; margin:30px auto; width:100%; max-width:900px; padding:15px; background:#f9f9f9; border-radius:12px; }}
-img.chart {{ max-width:100%; height:auto; border-radius:10px; display:block; }}
-footer {{ text-align:center; margin-top:40px; font-size:0.9em; color:#666; }}
-table {{ width:100%; border-collapse:collapse; margin-top:10px; }}
-th, td {{ border:1px solid #ddd; padding:8px; text-align:center; }}
-th {{ background:#1a73e8; color:white; }}
-</style>
+{REPORT_CSS}</style>
 </head>
 <body>
 
@@ -269,16 +386,33 @@ th {{ background:#1a73e8; color:white; }}
   <p><b>Run Folder:</b> {latest_folder} — <b>Generated on:</b> {timestamp}</p>
 </footer>
 
+<!-- AI_INSIGHTS_SLOT -->
 </body></html>
 """
 
+
+html = build_html(embed_chart(visual_chart_path), embed_chart(performance_chart_path), embed_trend_png())
+
 # === Save HTML and PDF ===
 with open(report_html, "w", encoding="utf-8") as f:
     f.write(html)
 print(f"✅ Interactive HTML report generated → {report_html}")
 
-try:
-    HTML(report_html).write_pdf(report_pdf)
-    print(f"📄 PDF exported successfully → {report_pdf}")
-except Exception as e:
-    print(f"⚠️ PDF export failed: {e}")
+if EXPORT_PDF:
+    pdf_html = build_html(
+        embed_chart(visual_chart_path, inline=False),
+        embed_chart(performance_chart_path, inline=False),
+        embed_trend_png(inline=False),
+    )
+    # WeasyPrint doesn't execute JS, so drop the CDN scripts instead of downloading them
+    pdf_html = strip_external_scripts(pdf_html)
+    try:
+        from weasyprint import HTML
+        # lay out once, then paint the same Document; the HTML file above is never re-read
+        doc = HTML(string=pdf_html, base_url=RESULTS).render(optimize_images=True)
+        doc.write_pdf(report_pdf, optimize_images=True)
+        print(f"📄 PDF exported successfully → {report_pdf} ({len(doc.pages)} pages)")
+    except Exception as e:
+        print(f"⚠️ PDF export failed: {e}")
+else:
+    print("ℹ️ EXPORT_PDF=0 — skipping PDF export.")
@@ -0,0 +1,70 @@
+"""
+io_utils.py
+Shared I/O helpers for the analysis scripts.
+
+JSON goes through orjson when it is installed (faster encode/decode, bytes
+output) and falls back to the stdlib json module otherwise. Chart output
+settings live here too so every script saves PNGs the same way.
+"""
+
+import functools
+import json
+import os
+import re
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+# Headless chart output: 80 DPI, tight bbox, optimized PNGs (smaller files for WeasyPrint)
+CHART_DPI = 80
+SAVEFIG_OPTS = dict(dpi=CHART_DPI, bbox_inches="tight", pil_kwargs={"optimize": True})
+
+# External <script src="http..."> tags (plotly.js CDN); WeasyPrint can't run them and would fetch them serially
+_STRIP_RE = re.compile(r'<script[^>]+src="https?://[^"]+"[^>]*></script>')
+
+
+def jdumps(obj, indent=False):
+    """Serialize obj to a str (2-space indent when indent=True)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+    return json.dumps(obj, indent=2 if indent else None)
+
+
+def jloads(data):
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_json(path):
+    """Read and parse a JSON file."""
+    with open(path, "rb") as f:
+        return jloads(f.read())
+
+
+def dump_json(obj, path):
+    """Write obj to path as indented JSON (numpy scalars/arrays accepted with orjson)."""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(obj, f, indent=2)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_visual_diff(path, mtime_ns):
+    return tuple(load_json(path))
+
+
+def load_visual_diff(path):
+    """Parsed visual_diff_summary.json records, memoized until the file changes."""
+    return _load_visual_diff(path, os.stat(path).st_mtime_ns)
+
+
+def strip_external_scripts(html):
+    """Remove external script tags from HTML before it is handed to WeasyPrint."""
+    return _STRIP_RE.sub("", html)
@@ -6,8 +6,10 @@ showing visual change percentages per page.
 """
 
 import os
-import json
+import matplotlib
+matplotlib.use("Agg")  # headless: no interactive backend needed
 import matplotlib.pyplot as plt
+from io_utils import load_visual_diff, CHART_DPI, SAVEFIG_OPTS
 
 # === Paths ===
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
@@ -19,8 +21,7 @@ os.makedirs(CHARTS_DIR, exist_ok=True)
 if not os.path.exists(VISUAL_DIFF_FILE):
     raise FileNotFoundError("❌ visual_diff_summary.json not found. Run visual_diff.js first!")
 
-with open(VISUAL_DIFF_FILE, "r", encoding="utf-8") as f:
-    data = json.load(f)
+data = load_visual_diff(VISUAL_DIFF_FILE)
 
 if not data:
     print("⚠️ No visual diff data available — all pages identical.")
@@ -30,16 +31,16 @@ pages = [d["page"] for d in data]
 diffs = [float(d["diffPercent"]) for d in data]
 
 # === Plot Chart ===
-plt.figure(figsize=(10, 5))
-plt.bar(pages, diffs)
-plt.xticks(rotation=30, ha="right")
-plt.xlabel("Pages")
-plt.ylabel("Visual Change (%)")
-plt.title("Visual Change Percentage per Page")
-plt.tight_layout()
+fig, ax = plt.subplots(figsize=(10, 5), dpi=CHART_DPI)
+ax.bar(pages, diffs)
+plt.setp(ax.get_xticklabels(), rotation=30, ha="right")
+ax.set_xlabel("Pages")
+ax.set_ylabel("Visual Change (%)")
+ax.set_title("Visual Change Percentage per Page")
+fig.tight_layout()
 
 chart_path = os.path.join(CHARTS_DIR, "visual_diff_chart.png")
-plt.savefig(chart_path)
-plt.close()
+fig.savefig(chart_path, **SAVEFIG_OPTS)
+plt.close(fig)
 
 print(f"✅ Visual diff chart saved → {chart_path}")
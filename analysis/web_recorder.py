@@ -1,21 +1,35 @@
 import os
-import glob
 import json
+import time
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # headless: no interactive backend needed
 import matplotlib.pyplot as plt
-from datetime import datetime
+from io_utils import load_json, dump_json, CHART_DPI, SAVEFIG_OPTS
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except Exception:
+    pa = pa_csv = None
 
 # === CONFIGURATION ===
 RESULTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "results"))
 
 # === STEP 1: Find latest crawl folder ===
-folders = [f for f in glob.glob(os.path.join(RESULTS_DIR, "*")) if os.path.isdir(f)]
+# single scandir pass; skip the shared charts/visual_diffs output folders
+with os.scandir(RESULTS_DIR) as it:
+    folders = [
+        e for e in it
+        if e.is_dir() and e.name not in {"visual_diffs", "charts"}
+    ]
 
 if not folders:
     print("⚠️ No crawl folders found inside:", RESULTS_DIR)
     exit(1)
 
-latest_folder = max(folders, key=os.path.getmtime)
+latest_folder = max(folders, key=lambda e: e.stat().st_mtime).path
 SUMMARY_PATH = os.path.join(latest_folder, "summary.json")
 
 print(f"📂 Reading summary from: {SUMMARY_PATH}")
@@ -27,8 +41,7 @@ if not os.path.exists(SUMMARY_PATH):
 
 # === STEP 2: Load summary data ===
 try:
-    with open(SUMMARY_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_json(SUMMARY_PATH)
 except json.JSONDecodeError:
     print("❌ summary.json is not a valid JSON file.")
     exit(1)
@@ -48,9 +61,15 @@ df["timeTaken"] = pd.to_numeric(df["timeTaken"], errors="coerce")
 
 # === STEP 4: Compute basic stats ===
 total_pages = len(df)
-avg_load_time = df["timeTaken"].mean()
-max_load = df["timeTaken"].max()
-min_load = df["timeTaken"].min()
+# all reductions on one contiguous float array instead of a pandas call per stat
+times = df["timeTaken"].to_numpy(dtype=np.float64)
+times = times[~np.isnan(times)]
+if times.size:
+    avg_load_time = times.mean()
+    max_load = times.max()
+    min_load = times.min()
+else:
+    avg_load_time = max_load = min_load = np.nan
 
 print("\n📊 Research Summary")
 print(f"🧾 Total Pages Crawled: {total_pages}")
@@ -60,23 +79,45 @@ print(f"🚀 Fastest Page: {min_load:.2f} sec")
 
 # === STEP 5: Save CSV ===
 csv_path = os.path.join(latest_folder, "crawl_metrics.csv")
-df.to_csv(csv_path, index=False)
+# pyarrow's C++ CSV writer when available; pandas' writer otherwise (or if a column won't convert)
+written = False
+if pa_csv is not None:
+    try:
+        pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), csv_path)
+        written = True
+    except Exception:
+        pass
+if not written:
+    df.to_csv(csv_path, index=False)
 print(f"💾 Metrics saved → {csv_path}")
 
+# Columnar sidecar for generate_report.py (needs pyarrow or fastparquet)
+parquet_path = os.path.join(latest_folder, "crawl_metrics.parquet")
+try:
+    df[["url", "timeTaken"]].to_parquet(parquet_path, index=False, compression="zstd")
+    print(f"💾 Metrics saved → {parquet_path}")
+except Exception as e:
+    # generate_report.py prefers the sidecar, so never leave an older (or partial) one next to the fresh CSV
+    try:
+        os.remove(parquet_path)
+    except OSError:
+        pass
+    print(f"⚠️ Parquet export skipped: {e}")
+
 # === STEP 6: Generate chart ===
 chart_dir = os.path.join(RESULTS_DIR, "charts")
 os.makedirs(chart_dir, exist_ok=True)
 
-chart_path = os.path.join(chart_dir, f"load_time_{datetime.now().strftime('%d-%b-%Y(%I_%M%p)')}.png")
+chart_path = os.path.join(chart_dir, f"load_time_{time.strftime('%d-%b-%Y(%I_%M%p)')}.png")
 
-plt.figure(figsize=(10, 6))
-plt.barh(df["url"], df["timeTaken"], color="royalblue")
-plt.xlabel("Load Time (seconds)")
-plt.ylabel("Page URL")
-plt.title("Average Page Load Time (Top URLs)")
-plt.tight_layout()
-plt.savefig(chart_path)
-plt.close()
+fig, ax = plt.subplots(figsize=(10, 6), dpi=CHART_DPI)
+ax.barh(df["url"], df["timeTaken"], color="royalblue")
+ax.set_xlabel("Load Time (seconds)")
+ax.set_ylabel("Page URL")
+ax.set_title("Average Page Load Time (Top URLs)")
+fig.tight_layout()
+fig.savefig(chart_path, **SAVEFIG_OPTS)
+plt.close(fig)
 
 print(f"📈 Chart saved → {chart_path}")
 
@@ -89,7 +130,7 @@ print(f"🐢 Top 5 slow pages saved → {slowest_path}")
 
 # === STEP 8: Final summary ===
 summary_data = {
-    "total_pages": int(total_pages),
+    "total_pages": total_pages,
     "average_load_time": round(float(avg_load_time), 2),
     "slowest_page": round(float(max_load), 2),
     "fastest_page": round(float(min_load), 2),
@@ -99,8 +140,7 @@ summary_data = {
 }
 
 summary_json_path = os.path.join(latest_folder, "crawl_summary.json")
-with open(summary_json_path, "w", encoding="utf-8") as f:
-    json.dump(summary_data, f, indent=4)
+dump_json(summary_data, summary_json_path)
 
 print(f"\n✅ Crawl summary JSON saved → {summary_json_path}")
 print("\n🎯 Web Recorder completed successfully!\n")